@@ -0,0 +1,350 @@
+"""
+PUBG 매칭 시뮬레이터
+- 실력/RP 분포를 가진 가상 플레이어 생성
+- 솔로/듀오/스쿼드 100인 로비를 매칭 정책별로 구성 (SBMM, 무작위, 대기시간 완화)
+- 참가자 데이터는 get_core_match_data와 같은 스키마로 출력
+- 로비 구성과 경기 결과 샘플링은 numpy 벡터 연산으로 처리 (배치 단위)
+"""
+
+import time
+import warnings
+
+import numpy as np
+
+from rating_analyzer import (
+    API_KEY,
+    SETTINGS,
+    MatchRecord,
+    MultiModePubgAnalyzer,
+    ParticipantRecord,
+)
+
+# ============================================
+# 설정 구역
+# ============================================
+
+SIMULATION_SETTINGS = {
+    'n_players': 200000,                    # 가상 플레이어 수 (배치당 최대 n_players / 100 로비)
+    'matches_per_mode': 20000,              # 정책/모드별 생성 매치 수
+    'game_modes': ['solo', 'duo', 'squad'], # 시뮬레이션할 게임 모드들
+    'policies': ['sbmm', 'random', 'wait_relaxed'],  # 비교할 매칭 정책들
+    'lobby_size': 100,                      # 로비 인원
+    'skill_std': 1.0,                       # 실력 분포 표준편차 (평균 0)
+    'rp_mean': 2200,                        # 실력 0인 플레이어의 평균 RP
+    'rp_per_skill': 700,                    # 실력 1 표준편차당 RP
+    'rp_noise': 300,                        # 실력과 무관한 RP 편차
+    'unranked_ratio': 0.1,                  # 레이팅 없는 플레이어 비율
+    'mmr_noise': 0.15,                      # 매칭 시스템이 추정하는 실력의 오차
+    'mean_wait': 60,                        # wait_relaxed: 평균 대기 시간(초)
+    'max_wait': 300,                        # wait_relaxed: 이 시간 이상 대기하면 완전 무작위 매칭
+    'outcome_noise': 1.0,                   # 경기 결과의 운 요소 (팀 성능 Gumbel 노이즈)
+    'max_time_survived': 1800,              # 우승 팀 생존 시간(초)
+    'seed': None,                           # 재현용 시드
+    'analyze_policy': 'sbmm',               # 분석 파이프라인에 넣을 정책 (None이면 생략)
+    'analyze_matches_per_mode': 300,        # 분석 파이프라인에 넣을 모드별 매치 수
+    'save_results': False,                  # 분석 결과를 pubg_multimode_analysis_*로 저장
+}
+
+# 모드별 팀 인원
+TEAM_SIZES = {'solo': 1, 'duo': 2, 'squad': 4}
+
+# ============================================
+# 플레이어 생성 / 매칭 정책 / 경기 결과
+# ============================================
+
+def generate_players(rng, settings):
+    """가상 플레이어 풀 생성 (실력, 현재 RP, 최고 RP 배열)"""
+    n_players = settings['n_players']
+    
+    skill = rng.normal(0, settings['skill_std'], n_players)
+    current_rp = (settings['rp_mean'] + settings['rp_per_skill'] * skill
+                  + rng.normal(0, settings['rp_noise'], n_players))
+    current_rp = np.clip(np.rint(current_rp), 1, 9999).astype(np.int32)
+    best_rp = np.minimum(current_rp + rng.gamma(2, 80, n_players).astype(np.int32), 9999)
+    
+    unranked = rng.random(n_players) < settings['unranked_ratio']
+    current_rp[unranked] = 0
+    best_rp[unranked] = 0
+    
+    return {'skill': skill, 'current_rp': current_rp, 'best_rp': best_rp}
+
+def estimate_mmr(rng, queue, players, settings):
+    """매칭 시스템이 보는 실력 (실제 실력 + 추정 오차)"""
+    return players['skill'][queue] + rng.normal(0, settings['mmr_noise'], len(queue))
+
+def random_policy(rng, queue, players, settings):
+    """무작위 매칭: 대기열 순서 그대로 (대기열 자체가 무작위 표본)"""
+    return queue
+
+def sbmm_policy(rng, queue, players, settings):
+    """실력 기반 매칭: 추정 실력 순으로 정렬해 인접한 플레이어끼리 로비/팀 구성"""
+    mmr = estimate_mmr(rng, queue, players, settings)
+    return queue[np.argsort(mmr, kind='stable')]
+
+def wait_relaxed_policy(rng, queue, players, settings):
+    """대기시간 완화 매칭: 오래 기다린 플레이어일수록 실력 조건을 무작위 쪽으로 완화
+    
+    정렬 키 = (1 - 완화도) * 실력 백분위 + 완화도 * 무작위 값
+    완화도 = min(대기 시간 / max_wait, 1)
+    """
+    mmr = estimate_mmr(rng, queue, players, settings)
+    wait = rng.exponential(settings['mean_wait'], len(queue))
+    relax = np.minimum(wait / settings['max_wait'], 1.0)
+    
+    percentile = np.empty(len(queue))
+    percentile[np.argsort(mmr)] = np.linspace(0, 1, len(queue))
+    
+    key = (1 - relax) * percentile + relax * rng.random(len(queue))
+    return queue[np.argsort(key)]
+
+# 매칭 정책 (이름: 대기열 -> 로비 순서로 정렬된 대기열)
+MATCHMAKING_POLICIES = {
+    'sbmm': sbmm_policy,
+    'random': random_policy,
+    'wait_relaxed': wait_relaxed_policy,
+}
+
+def sample_outcomes(rng, lobbies, players, team_size, settings):
+    """로비 행렬(로비 수 x 인원)의 경기 결과를 한 번에 샘플링
+    
+    팀 성능 = 팀 평균 실력 + Gumbel 노이즈, 성능 순으로 순위 결정
+    킬은 상대 실력과 생존 순위에 비례하는 포아송 분포
+    """
+    n_lobbies, lobby_size = lobbies.shape
+    n_teams = lobby_size // team_size
+    skill = players['skill'][lobbies]
+    
+    # 팀 순위
+    team_skill = skill.reshape(n_lobbies, n_teams, team_size).mean(axis=2)
+    performance = team_skill + rng.gumbel(0, settings['outcome_noise'], team_skill.shape)
+    order = np.argsort(-performance, axis=1)
+    team_place = np.empty_like(order)
+    np.put_along_axis(team_place, order, np.broadcast_to(np.arange(1, n_teams + 1), order.shape), axis=1)
+    win_place = np.repeat(team_place, team_size, axis=1)
+    
+    # 생존 시간 (순위가 높을수록 오래 생존)
+    survival = 1 - (win_place - 1) / n_teams
+    time_survived = settings['max_time_survived'] * survival ** 0.8 * rng.uniform(0.85, 1.0, win_place.shape)
+    
+    # 킬: 로비 전체 킬이 사망자 수의 약 90%가 되도록 정규화
+    relative_skill = skill - skill.mean(axis=1, keepdims=True)
+    kill_rate = np.exp(0.6 * relative_skill) * (0.3 + 1.7 * survival)
+    kill_rate *= 0.9 * (lobby_size - team_size) / kill_rate.sum(axis=1, keepdims=True)
+    kills = rng.poisson(kill_rate)
+    
+    damage = kills * 100 * rng.uniform(0.8, 1.3, kills.shape) + rng.gamma(1.5, 40, kills.shape)
+    assists = rng.poisson(0.25 * kill_rate) if team_size > 1 else np.zeros_like(kills)
+    
+    return {
+        'win_place': win_place,
+        'kills': kills,
+        'damage': np.round(damage, 1),
+        'assists': assists,
+        'time_survived': np.round(time_survived, 1),
+    }
+
+def summarize_lobbies(batch, players, team_size):
+    """로비별 공정성 지표 (레이팅 보유자 기준 RP 표준편차, 최고-최저 차이, 팀 간 평균 RP 편차)"""
+    rp = players['current_rp'][batch['lobbies']].astype(np.float64)
+    rp[rp == 0] = np.nan
+    n_lobbies, lobby_size = rp.shape
+    
+    # 팀원 전원이 레이팅이 없는 팀은 NaN으로 제외
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        team_rp = np.nanmean(rp.reshape(n_lobbies, lobby_size // team_size, team_size), axis=2)
+        
+        return {
+            'rp_std': np.nanstd(rp, axis=1, ddof=1),
+            'rp_range': np.nanmax(rp, axis=1) - np.nanmin(rp, axis=1),
+            'team_rp_std': np.nanstd(team_rp, axis=1, ddof=1),
+        }
+
+# ============================================
+# 시뮬레이터
+# ============================================
+
+class MatchmakingSimulator:
+    def __init__(self, settings):
+        self.settings = settings
+        self.rng = np.random.default_rng(settings.get('seed'))
+        self.players = generate_players(self.rng, settings)
+        self.match_count = 0
+        
+        print("매칭 시뮬레이터 초기화 완료")
+        print(f"가상 플레이어: {settings['n_players']:,}명")
+        print(f"레이팅 보유: {np.count_nonzero(self.players['current_rp']):,}명")
+    
+    def simulate(self, game_mode, n_matches, policy='sbmm'):
+        """매치 배치 생성 (열 단위 numpy 배열)
+        
+        배치 하나는 플레이어 풀에서 중복 없이 뽑은 대기열 한 번에 해당
+        """
+        if policy not in MATCHMAKING_POLICIES:
+            raise ValueError(f"알 수 없는 매칭 정책: {policy} (가능: {', '.join(MATCHMAKING_POLICIES)})")
+        
+        lobby_size = self.settings['lobby_size']
+        team_size = TEAM_SIZES[game_mode]
+        lobbies_per_batch = self.settings['n_players'] // lobby_size
+        if lobbies_per_batch == 0:
+            raise ValueError(f"n_players는 lobby_size({lobby_size}) 이상이어야 합니다")
+        
+        remaining = n_matches
+        while remaining > 0:
+            n_lobbies = min(remaining, lobbies_per_batch)
+            
+            queue = self.rng.choice(self.settings['n_players'], size=n_lobbies * lobby_size, replace=False)
+            queue = MATCHMAKING_POLICIES[policy](self.rng, queue, self.players, self.settings)
+            lobbies = queue.reshape(n_lobbies, lobby_size)
+            
+            batch = {
+                'game_mode': game_mode,
+                'policy': policy,
+                'first_match': self.match_count,
+                'lobbies': lobbies,
+                **sample_outcomes(self.rng, lobbies, self.players, team_size, self.settings)
+            }
+            
+            self.match_count += n_lobbies
+            remaining -= n_lobbies
+            yield batch
+    
+    def get_match_id(self, batch, i):
+        return f"sim-{batch['game_mode']}-{batch['policy']}-{batch['first_match'] + i:010d}"
+    
+    def get_player_id(self, player_index):
+        return f"sim.{player_index:010d}"
+    
+    def get_player_name(self, player_index):
+        return f"SimPlayer_{player_index}"
+    
+    def iter_participants(self, batch):
+        """배치의 매치별 (match_id, 참가자 목록) - get_core_match_data의 participants 스키마"""
+        columns = {key: batch[key].tolist() for key in ('lobbies', 'kills', 'damage', 'assists',
+                                                       'win_place', 'time_survived')}
+        
+        for i, lobby in enumerate(columns['lobbies']):
+            participants = []
+            for j, player_index in enumerate(lobby):
+                participants.append({
+                    'player_id': self.get_player_id(player_index),
+                    'player_name': self.get_player_name(player_index),
+                    'kills': columns['kills'][i][j],
+                    'damage': columns['damage'][i][j],
+                    'assists': columns['assists'][i][j],
+                    'win_place': columns['win_place'][i][j],
+                    'time_survived': columns['time_survived'][i][j],
+                })
+            yield self.get_match_id(batch, i), participants
+    
+    def iter_matches(self, game_mode, n_matches, policy='sbmm'):
+        """get_core_match_data와 같은 형태의 매치 정보 생성"""
+        for batch in self.simulate(game_mode, n_matches, policy):
+            for match_id, participants in self.iter_participants(batch):
+                yield {
+                    'match_id': match_id,
+                    'game_mode': game_mode,
+                    'is_ranked': True,
+                    'participants': participants
+                }
+    
+    def build_records(self, game_mode, n_matches, policy, player_table, first_number=1):
+        """분석 파이프라인용 참가자 레코드 (analyze_match_with_ratings 결과와 같은 형태)"""
+        records = []
+        analyzed_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        match_number = first_number
+        
+        for batch in self.simulate(game_mode, n_matches, policy):
+            current_rp = self.players['current_rp'][batch['lobbies']].tolist()
+            best_rp = self.players['best_rp'][batch['lobbies']].tolist()
+            
+            for i, (match_id, participants) in enumerate(self.iter_participants(batch)):
+                match = MatchRecord(match_id, match_number, game_mode, True, analyzed_at, player_table)
+                for j, participant in enumerate(participants):
+                    records.append(ParticipantRecord(
+                        match,
+                        player_table.add(participant['player_id'], participant['player_name']),
+                        kills=participant['kills'],
+                        damage=participant['damage'],
+                        assists=participant['assists'],
+                        win_place=participant['win_place'],
+                        time_survived=participant['time_survived'],
+                        current_rp=current_rp[i][j],
+                        best_rp=best_rp[i][j]
+                    ))
+                match_number += 1
+        
+        return records
+    
+    def compare_policies(self, game_modes, policies, n_matches):
+        """모드/정책별 로비 공정성 지표 비교 (매치 평균)"""
+        comparison = {}
+        
+        for game_mode in game_modes:
+            team_size = TEAM_SIZES[game_mode]
+            for policy in policies:
+                start_time = time.time()
+                summaries = [summarize_lobbies(batch, self.players, team_size)
+                             for batch in self.simulate(game_mode, n_matches, policy)]
+                elapsed = time.time() - start_time
+                
+                comparison[(game_mode, policy)] = {
+                    metric: float(np.nanmean(np.concatenate([summary[metric] for summary in summaries])))
+                    for metric in ('rp_std', 'rp_range', 'team_rp_std')
+                }
+                comparison[(game_mode, policy)]['matches_per_second'] = n_matches / elapsed if elapsed > 0 else 0
+        
+        return comparison
+
+def main():
+    settings = SIMULATION_SETTINGS
+    
+    print("PUBG 매칭 시뮬레이터 (솔로/듀오/스쿼드)")
+    print("=" * 60)
+    print("현재 설정:")
+    for key, value in settings.items():
+        print(f"   {key}: {value}")
+    print()
+    
+    simulator = MatchmakingSimulator(settings)
+    
+    # 1단계: 정책별 로비 공정성 비교
+    print(f"\n1단계: 매칭 정책 비교 (모드/정책별 {settings['matches_per_mode']:,}개 매치)")
+    print("-" * 40)
+    
+    comparison = simulator.compare_policies(settings['game_modes'], settings['policies'],
+                                            settings['matches_per_mode'])
+    
+    for game_mode in settings['game_modes']:
+        print(f"\n{game_mode.upper()}:")
+        for policy in settings['policies']:
+            stat = comparison[(game_mode, policy)]
+            line = f"  {policy:<13} RP 표준편차 {stat['rp_std']:6.0f}  최고-최저 {stat['rp_range']:6.0f}"
+            if TEAM_SIZES[game_mode] > 1:
+                line += f"  팀 간 편차 {stat['team_rp_std']:6.0f}"
+            print(f"{line}  ({stat['matches_per_second']:,.0f} 매치/초)")
+    
+    # 2단계: 합성 데이터로 분석 파이프라인 실행
+    policy = settings.get('analyze_policy')
+    if not policy:
+        return
+    
+    print(f"\n2단계: {policy} 합성 매치 분석")
+    print("-" * 40)
+    
+    analyzer = MultiModePubgAnalyzer(API_KEY, {**SETTINGS, 'game_modes': settings['game_modes']})
+    analyzer.current_season_id = f"simulation-{policy}"
+    
+    records = []
+    n_matches = settings['analyze_matches_per_mode']
+    for i, game_mode in enumerate(settings['game_modes']):
+        records.extend(simulator.build_records(game_mode, n_matches, policy, analyzer.players,
+                                               first_number=i * n_matches + 1))
+    
+    results = analyzer.process_results(records)
+    if settings['save_results']:
+        analyzer.save_results(results)
+    analyzer.print_summary(results)
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,34 @@ PUBG 다중 모드 분석기
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import math
 import time
 import json
 import csv
+import glob
+import os
+import random
+import re
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+try:
+    import numpy as np
+except ImportError:  # 부트스트랩 신뢰구간 계산에만 필요
+    np = None
+
+try:
+    import resource
+except ImportError:  # Windows에서는 프로세스 최대 RSS를 기록하지 않음
+    resource = None
 
 # ============================================
 # 설정 구역
@@ -28,6 +52,25 @@ SETTINGS = {
     'ranked_only': True,                    # 경쟁전만 분석
     'matches_per_mode': 1,                  # 새로 추가: 모드별 매치 수
     'balanced_collection': True,            # 새로 추가: 모드별 균등 수집
+    'request_timeouts': {                   # 엔드포인트별 (연결, 응답) 타임아웃(초)
+        'seasons': (5, 10),
+        'samples': (5, 30),
+        'players': (5, 15),
+        'ranked': (5, 15),
+        'matches': (5, 30),
+    },
+    'max_retries': 4,                       # 429/5xx/연결 오류 재시도 횟수
+    'retry_backoff_base': 1.0,              # 재시도 대기 기본값(초), 시도마다 2배
+    'retry_backoff_max': 30.0,              # 재시도 대기 최대값(초)
+    'bootstrap_resamples': 2000,            # 모드별 신뢰구간 부트스트랩 재표본 수 (0이면 생략)
+    'bootstrap_confidence': 0.95,           # 신뢰수준
+    'bootstrap_workers': None,              # 프로세스 수 (None이면 CPU 수, 1이면 단일 프로세스)
+    'bootstrap_seed': None,                 # 재현용 시드
+    'profiling': False,                     # 단계/매치별 시간·메모리 측정 및 트레이스 파일 저장
+    'profile_memory': False,                # 구간별 파이썬 메모리 최고치 기록 (tracemalloc, CPU 측정이 느려짐)
+    'profile_sampling': False,              # 단계별 샘플링 프로파일 저장 (profiling 필요)
+    'profile_interval': 0.005,              # 샘플링 간격(초)
+    'profile_dir': 'profiles',              # 트레이스/프로파일 저장 폴더
 }
 
 # 시작점용 플레이어들 (known_players 또는 mixed 방식용)
@@ -35,6 +78,693 @@ SEED_PLAYERS = [
     'KKyydsDDDD_'
 ]
 
+# ============================================
+# 참가자 레코드 (메모리 절약형)
+# ============================================
+
+# 매치 단위 필드 (매치당 한 번만 저장)
+MATCH_FIELDS = ('match_id', 'match_number', 'game_mode', 'is_ranked', 'analyzed_at')
+
+# 참가자 단위 수치 필드
+STAT_FIELDS = ('kills', 'damage', 'assists', 'win_place', 'time_survived', 'current_rp', 'best_rp')
+
+# 기존 dict 행과 같은 필드 순서 (CSV 컬럼 순서)
+PARTICIPANT_FIELDS = (
+    'match_id', 'match_number', 'game_mode', 'is_ranked',
+    'player_id', 'player_name',
+    'kills', 'damage', 'assists', 'win_place', 'time_survived',
+    'current_rp', 'best_rp', 'analyzed_at'
+)
+
+class PlayerTable:
+    """플레이어 ID/이름 인턴 테이블 (매치마다 반복되는 문자열을 한 번만 저장)"""
+    
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.index = {}
+    
+    def add(self, player_id, player_name):
+        """(ID, 이름) 쌍의 인덱스 반환 (처음 보면 추가)"""
+        key = (player_id, player_name)
+        player_index = self.index.get(key)
+        if player_index is None:
+            player_index = len(self.ids)
+            self.ids.append(sys.intern(str(player_id)))
+            self.names.append(sys.intern(str(player_name)))
+            self.index[key] = player_index
+        return player_index
+    
+    def __len__(self):
+        return len(self.ids)
+
+class MatchRecord:
+    """매치 단위 정보 (같은 매치의 참가자 레코드들이 공유)"""
+    
+    __slots__ = MATCH_FIELDS + ('players',)
+    
+    def __init__(self, match_id, match_number, game_mode, is_ranked, analyzed_at, players):
+        self.match_id = sys.intern(str(match_id))
+        self.match_number = match_number
+        self.game_mode = sys.intern(str(game_mode))
+        self.is_ranked = is_ranked
+        self.analyzed_at = analyzed_at
+        self.players = players
+
+class ParticipantRecord(Mapping):
+    """참가자 한 명의 분석 결과
+    
+    매치 정보는 MatchRecord, 플레이어 ID/이름은 PlayerTable을 참조하고
+    수치만 직접 보관함. 기존 dict 행처럼 record['kills'], record.get(...),
+    dict(record), {**record} 로 사용할 수 있음
+    """
+    
+    __slots__ = ('match', 'player_index') + STAT_FIELDS + ('extra',)
+    
+    def __init__(self, match, player_index, kills=0, damage=0, assists=0, win_place=0,
+                 time_survived=0, current_rp=0, best_rp=0, extra=None):
+        self.match = match
+        self.player_index = player_index
+        self.kills = kills
+        self.damage = damage
+        self.assists = assists
+        self.win_place = win_place
+        self.time_survived = time_survived
+        self.current_rp = current_rp
+        self.best_rp = best_rp
+        self.extra = extra or None
+    
+    def __getitem__(self, key):
+        if key in STAT_FIELDS:
+            return getattr(self, key)
+        if key in MATCH_FIELDS:
+            return getattr(self.match, key)
+        if key == 'player_id':
+            return self.match.players.ids[self.player_index]
+        if key == 'player_name':
+            return self.match.players.names[self.player_index]
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key in STAT_FIELDS:
+            setattr(self, key, value)
+        elif key in MATCH_FIELDS:
+            # 매치 단위 필드는 같은 매치의 모든 레코드에 반영됨
+            setattr(self.match, key, value)
+        elif key in ('player_id', 'player_name'):
+            players = self.match.players
+            player = {'player_id': players.ids[self.player_index],
+                      'player_name': players.names[self.player_index], key: value}
+            self.player_index = players.add(player['player_id'], player['player_name'])
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    
+    def __iter__(self):
+        yield from PARTICIPANT_FIELDS
+        if self.extra:
+            yield from self.extra
+    
+    def __len__(self):
+        return len(PARTICIPANT_FIELDS) + (len(self.extra) if self.extra else 0)
+    
+    def __repr__(self):
+        return f"ParticipantRecord({dict(self)!r})"
+
+def make_participant_record(row, players, match_cache):
+    """dict 행을 ParticipantRecord로 변환
+    
+    match_cache: 같은 매치 정보를 공유하기 위한 {match_id: MatchRecord}
+    행마다 analyzed_at이 다른 이전 저장 파일도 매치당 MatchRecord 하나만 만들고,
+    공유 레코드에는 가장 최근 analyzed_at을 남김
+    """
+    match_id = row.get('match_id')
+    match = match_cache.get(match_id)
+    if match is None:
+        match = MatchRecord(*(row.get(field) for field in MATCH_FIELDS), players)
+        match_cache[match_id] = match
+    elif str(row.get('analyzed_at') or '') > str(match.analyzed_at or ''):
+        match.analyzed_at = row.get('analyzed_at')
+    
+    player_index = players.add(row.get('player_id', ''), row.get('player_name', 'Unknown'))
+    extra = {key: value for key, value in row.items() if key not in PARTICIPANT_FIELDS}
+    
+    return ParticipantRecord(match, player_index, extra=extra,
+                             **{field: row.get(field, 0) for field in STAT_FIELDS})
+
+def _json_default(value):
+    """json.dump에서 참가자 레코드를 dict로 직렬화"""
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+# ============================================
+# 저장된 결과 로딩 (오프라인 재분석용)
+# ============================================
+
+# 게임 모드 출력 순서
+MODE_ORDER = ['solo', 'duo', 'squad']
+
+# 결과 파일 이름 접두사 (실시간 분석 / 오프라인 병합)
+RESULT_PREFIX = 'pubg_multimode_analysis'
+MERGED_RESULT_PREFIX = 'pubg_multimode_merged'
+
+# 저장된 JSON에서 참가자 배열 시작 위치
+ALL_PLAYERS_PATTERN = re.compile(r'"all_players"\s*:\s*\[')
+
+def _parse_number(value):
+    """CSV 문자열을 int 또는 float로 변환"""
+    if isinstance(value, (int, float)):
+        return value
+    if value in (None, ''):
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def _parse_bool(value):
+    """CSV 문자열을 bool로 변환"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('true', '1', 'yes')
+
+# 저장된 행의 필드별 타입 (CSV는 모든 값이 문자열)
+SAVED_ROW_TYPES = {
+    'match_number': _parse_number,
+    'is_ranked': _parse_bool,
+    'kills': _parse_number,
+    'damage': _parse_number,
+    'assists': _parse_number,
+    'win_place': _parse_number,
+    'time_survived': _parse_number,
+    'current_rp': _parse_number,
+    'best_rp': _parse_number,
+}
+
+def _normalize_saved_row(row):
+    """저장된 행의 타입 복원"""
+    for key, parse in SAVED_ROW_TYPES.items():
+        if key in row:
+            row[key] = parse(row[key])
+    return row
+
+def _iter_saved_json_rows(path, metadata, chunk_size=1 << 16):
+    """저장된 JSON의 all_players 배열을 한 행씩 스트리밍으로 읽기"""
+    decoder = json.JSONDecoder()
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        # all_players 배열 시작까지 건너뛰기 (matches 그룹은 읽지 않음)
+        buffer = ''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                print(f"   {path}: all_players 항목 없음")
+                return
+            buffer += chunk
+            found = ALL_PLAYERS_PATTERN.search(buffer)
+            if found:
+                buffer = buffer[found.end():]
+                break
+            buffer = buffer[-64:]  # 청크 경계에 걸친 키 대비
+        
+        # 배열 원소를 하나씩 디코딩
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if buffer.startswith(']'):
+                break
+            try:
+                row, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"{path}: all_players 배열이 중간에 끝남")
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            yield _normalize_saved_row(row)
+        
+        # 배열 뒤의 statistics 등 작은 항목은 한 번에 파싱
+        rest = buffer[1:].strip()
+        rest = rest + f.read()
+        rest = rest.strip()
+        if rest.startswith(','):
+            try:
+                metadata.update(json.loads('{' + rest[1:]))
+            except json.JSONDecodeError:
+                pass
+
+def _iter_saved_csv_rows(path):
+    """저장된 CSV를 한 행씩 읽기"""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            yield _normalize_saved_row(row)
+
+def iter_saved_rows(path, metadata=None):
+    """저장된 분석 결과(JSON/CSV)에서 참가자 행을 지연 로딩
+    
+    metadata가 주어지면 JSON의 statistics 등 부가 정보를 채워 넣음
+    """
+    if metadata is None:
+        metadata = {}
+    
+    if path.lower().endswith('.csv'):
+        return _iter_saved_csv_rows(path)
+    return _iter_saved_json_rows(path, metadata)
+
+def expand_result_paths(patterns):
+    """파일/디렉터리/와일드카드 인자를 결과 파일 목록으로 확장
+    
+    디렉터리는 실시간 분석 결과(pubg_multimode_analysis_*)만 읽고 병합 결과는 제외함.
+    같은 실행의 JSON/CSV가 모두 있으면 시즌 정보가 있는 JSON 하나만 사용
+    """
+    stems = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, f'{RESULT_PREFIX}_*')
+        matched = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matched:
+            stem, extension = os.path.splitext(path)
+            extension = extension.lower()
+            if extension not in ('.json', '.csv'):
+                continue
+            if stem not in stems or extension == '.json':
+                stems[stem] = path
+    return list(stems.values())
+
+# ============================================
+# HTTP 전송 계층
+# ============================================
+
+class PubgApiError(Exception):
+    """재시도 후에도 실패한 API 요청"""
+
+class PubgApiTransport:
+    """커넥션 풀 기반 PUBG API 전송 계층
+    - 세션 재사용으로 매 요청마다 TLS 핸드셰이크를 하지 않음
+    - gzip 압축 응답 요청
+    - 엔드포인트별 타임아웃
+    - 429/5xx/연결 오류는 지터가 있는 지수 백오프로 제한된 횟수만 재시도
+    - before_request 훅은 재시도를 포함한 매 전송 직전에 호출됨 (Rate Limit 관리용)
+    """
+    
+    RETRY_STATUS_CODES = {500, 502, 503, 504}
+    DEFAULT_TIMEOUT = (5, 30)
+    
+    # 일시적인 연결 오류 (응답 본문 수신 중 끊김, 깨진 gzip 본문 포함)
+    RETRY_EXCEPTIONS = (
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+        requests.exceptions.ContentDecodingError,
+    )
+    
+    def __init__(self, api_key, settings, before_request=None, profiler=None):
+        self.settings = settings
+        self.before_request = before_request
+        self.profiler = profiler
+        self.max_retries = settings.get('max_retries', 4)
+        self.backoff_base = settings.get('retry_backoff_base', 1.0)
+        self.backoff_max = settings.get('retry_backoff_max', 30.0)
+        self.timeouts = settings.get('request_timeouts', {})
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Accept': 'application/vnd.api+json',
+            'Accept-Encoding': 'gzip'
+        })
+    
+    def get_endpoint(self, url):
+        """URL에서 엔드포인트 종류 추출 (seasons, samples, players, ranked, matches)"""
+        parts = [part for part in urlparse(url).path.split('/') if part]
+        if parts and parts[-1] == 'ranked':
+            return 'ranked'
+        if len(parts) >= 3 and parts[0] == 'shards':
+            return parts[2]
+        return parts[0] if parts else ''
+    
+    def get_timeout(self, url):
+        """엔드포인트별 타임아웃"""
+        return self.timeouts.get(self.get_endpoint(url), self.DEFAULT_TIMEOUT)
+    
+    def get_backoff(self, attempt):
+        """지터가 있는 지수 백오프 대기 시간 (full jitter)"""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    def get_rate_limit_wait(self, response):
+        """429 응답의 Retry-After / X-RateLimit-Reset 헤더로 대기 시간 계산"""
+        retry_after = response.headers.get('Retry-After')
+        reset_at = response.headers.get('X-RateLimit-Reset')
+        wait_time = 60
+        
+        try:
+            if retry_after is not None:
+                wait_time = float(retry_after)
+            elif reset_at is not None:
+                wait_time = float(reset_at) - time.time()
+        except ValueError:
+            pass
+        
+        # 여러 요청이 동시에 풀리지 않도록 약간의 지터 추가
+        return min(max(wait_time, 1), 60) + random.uniform(0, 1)
+    
+    def span(self, name, category, **args):
+        """프로파일러가 있으면 구간 측정"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.span(name, category, **args)
+    
+    def get(self, url, description=""):
+        """GET 요청 (일시적 오류만 재시도, 그 외 응답은 그대로 반환)"""
+        timeout = self.get_timeout(url)
+        endpoint = self.get_endpoint(url)
+        
+        for attempt in range(self.max_retries + 1):
+            if self.before_request:
+                self.before_request(description)
+            
+            try:
+                with self.span('http_request', 'io', endpoint=endpoint, attempt=attempt):
+                    response = self.session.get(url, timeout=timeout)
+            except self.RETRY_EXCEPTIONS as e:
+                reason = f"연결 오류: {e}"
+                wait_time = self.get_backoff(attempt)
+            else:
+                if response.status_code == 429:
+                    reason = "Rate limit 초과"
+                    wait_time = self.get_rate_limit_wait(response)
+                elif response.status_code in self.RETRY_STATUS_CODES:
+                    reason = f"서버 오류 {response.status_code}"
+                    wait_time = self.get_backoff(attempt)
+                else:
+                    return response
+            
+            if attempt == self.max_retries:
+                raise PubgApiError(f"{reason} ({self.max_retries}회 재시도 후 실패)")
+            
+            print(f"   {reason}. {wait_time:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries}): {description}")
+            with self.span('retry_wait', 'wait', endpoint=endpoint, reason=reason):
+                time.sleep(wait_time)
+    
+    def close(self):
+        """커넥션 풀 정리"""
+        self.session.close()
+
+# ============================================
+# 부트스트랩 신뢰구간
+# ============================================
+
+# 신뢰구간을 계산할 매치 단위 지표 (출력 이름)
+BOOTSTRAP_METRICS = {
+    'avg_current_rp': '평균 현재 RP',
+    'rp_std': '매치 내 실력 분산(RP 표준편차)',
+    'rp_range': '최고-최저 RP 차이',
+    'fairness_probability': '공정성 확률',
+}
+
+# 한 번에 만드는 인덱스 행렬 원소 수 상한 (메모리 제한)
+BOOTSTRAP_CHUNK_ELEMENTS = 4_000_000
+
+def get_match_metric_terms(match_rows):
+    """매치 하나의 지표별 (분자, 분모)
+    
+    모드별 추정치는 재표본된 매치들의 분자 합 / 분모 합으로 계산됨
+    - avg_current_rp: 레이팅 보유자 RP 합 / 레이팅 보유자 수 (플레이어 가중 평균)
+    - rp_std, rp_range, fairness_probability: 매치별 값 / 1 (매치 평균)
+    값이 없는 매치는 분모 0으로 해당 지표에서 제외
+    """
+    rated_rp = [row['current_rp'] for row in match_rows if row['current_rp'] > 0]
+    terms = {
+        'avg_current_rp': (float(sum(rated_rp)), float(len(rated_rp))),
+        'rp_std': (0.0, 0.0),
+        'rp_range': (0.0, 0.0),
+        'fairness_probability': (0.0, 0.0),
+    }
+    
+    if len(rated_rp) >= 2:
+        mean_rp = sum(rated_rp) / len(rated_rp)
+        variance = sum((rp - mean_rp) ** 2 for rp in rated_rp) / (len(rated_rp) - 1)
+        terms['rp_std'] = (math.sqrt(variance), 1.0)
+        terms['rp_range'] = (float(max(rated_rp) - min(rated_rp)), 1.0)
+    
+    # 공정성 모델 결과가 행에 포함된 경우에만 사용 (매치 단위 값)
+    fairness = [row['fairness_probability'] for row in match_rows
+                if row.get('fairness_probability') not in (None, '')]
+    if fairness:
+        terms['fairness_probability'] = (float(fairness[0]), 1.0)
+    
+    return terms
+
+def _bootstrap_chunk(numerators, denominators, n_resamples, seed):
+    """재표본 n_resamples개의 지표 추정치 (지표 수 x n_resamples)
+    
+    매치 인덱스 행렬 한 번으로 모든 지표를 동시에 재표본함
+    """
+    rng = np.random.default_rng(seed)
+    n_matches = numerators.shape[1]
+    indices = rng.integers(0, n_matches, size=(n_resamples, n_matches))
+    
+    resampled_num = numerators.take(indices, axis=1).sum(axis=2)
+    resampled_den = denominators.take(indices, axis=1).sum(axis=2)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return resampled_num / resampled_den
+
+def bootstrap_confidence_intervals(numerators, denominators, n_resamples, confidence,
+                                   workers=None, seed=None):
+    """매치 단위 부트스트랩 백분위 신뢰구간
+    
+    numerators, denominators: (지표 수, 매치 수) 배열
+    반환: 지표별 (추정치, 하한, 상한) 배열 3개
+    """
+    n_metrics, n_matches = numerators.shape
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        estimates = numerators.sum(axis=1) / denominators.sum(axis=1)
+    
+    # 인덱스 행렬 메모리 상한에 맞춰 재표본을 청크로 분할
+    chunk_size = max(1, min(n_resamples, BOOTSTRAP_CHUNK_ELEMENTS // max(1, n_matches * n_metrics)))
+    chunk_sizes = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunk_sizes))
+    
+    # 작업량이 작으면 프로세스 생성 비용이 더 큼
+    if workers > 1 and n_resamples * n_matches >= BOOTSTRAP_CHUNK_ELEMENTS:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(_bootstrap_chunk,
+                                       [numerators] * len(chunk_sizes),
+                                       [denominators] * len(chunk_sizes),
+                                       chunk_sizes, seeds))
+    else:
+        chunks = [_bootstrap_chunk(numerators, denominators, size, chunk_seed)
+                  for size, chunk_seed in zip(chunk_sizes, seeds)]
+    
+    samples = np.concatenate(chunks, axis=1)
+    alpha = (1 - confidence) / 2
+    
+    with np.errstate(invalid='ignore'):
+        lower = np.nanpercentile(samples, alpha * 100, axis=1)
+        upper = np.nanpercentile(samples, (1 - alpha) * 100, axis=1)
+    
+    return estimates, lower, upper
+
+# ============================================
+# 프로파일링 / 트레이싱
+# ============================================
+
+class StackSampler:
+    """대상 스레드의 호출 스택을 주기적으로 수집하는 샘플링 프로파일러
+    
+    결과는 collapsed stack 형식(.folded)으로 저장되어
+    speedscope, flamegraph.pl 등에서 플레임 그래프로 볼 수 있음
+    """
+    
+    def __init__(self, interval, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+        self.thread.start()
+    
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+    
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+    
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class RunProfiler:
+    """분석 실행의 단계/매치/요청 단위 구간 기록
+    - 구간마다 wall 시간, CPU 시간(메인 스레드), 프로세스 최대 RSS
+    - profile_memory이면 파이썬 메모리 최고치(tracemalloc)도 기록 (할당이 많은 코드의 CPU 시간이 크게 늘어남)
+    - Chrome Trace Event 형식으로 저장 (chrome://tracing, Perfetto에서 열기)
+    - profile_sampling이면 단계별 샘플링 프로파일 저장
+    - profiling이 꺼져 있으면 span()은 아무것도 하지 않음
+    """
+    
+    def __init__(self, settings):
+        self.enabled = settings.get('profiling', False)
+        self.memory = self.enabled and settings.get('profile_memory', False)
+        self.sampling = self.enabled and settings.get('profile_sampling', False)
+        self.interval = settings.get('profile_interval', 0.005)
+        self.output_dir = settings.get('profile_dir', 'profiles')
+        
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.origin = time.perf_counter()
+        self.events = []
+        self.open_spans = []
+        self.started_tracemalloc = False
+        
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+    
+    def span(self, name, category='stage', **args):
+        """구간 측정 컨텍스트 (category='stage'인 구간만 샘플링 프로파일 저장)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, category, args)
+    
+    @contextmanager
+    def _span(self, name, category, args):
+        sampler = None
+        if self.sampling and category == 'stage':
+            sampler = StackSampler(self.interval)
+            sampler.start()
+        
+        # 바깥 구간의 메모리 최고치를 보존한 뒤 이 구간용으로 초기화
+        current = {'peak': 0}
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            if self.open_spans:
+                self.open_spans[-1]['peak'] = max(self.open_spans[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            self.open_spans.append(current)
+        
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall_end = time.perf_counter()
+            cpu_end = time.thread_time()
+            
+            args = {
+                **args,
+                'wall_ms': round((wall_end - wall_start) * 1000, 3),
+                'cpu_ms': round((cpu_end - cpu_start) * 1000, 3),
+            }
+            
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                self.open_spans.pop()
+                peak = max(peak, current['peak'])
+                if self.open_spans:
+                    self.open_spans[-1]['peak'] = max(self.open_spans[-1]['peak'], peak)
+                args['py_peak_mb'] = round(peak / 1024 / 1024, 3)
+            if resource is not None:
+                max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                # Linux는 KB, macOS는 바이트 단위
+                args['max_rss_mb'] = round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+            
+            if sampler:
+                sampler.stop()
+                os.makedirs(self.output_dir, exist_ok=True)
+                profile_path = os.path.join(self.output_dir, f"pubg_profile_{self.run_id}_{name}.folded")
+                sampler.save(profile_path)
+                args['profile'] = profile_path
+            
+            self.events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((wall_start - self.origin) * 1e6),
+                'dur': round((wall_end - wall_start) * 1e6),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': args
+            })
+    
+    def save_trace(self):
+        """Chrome Trace Event 형식으로 트레이스 저장"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        trace_path = os.path.join(self.output_dir, f"pubg_trace_{self.run_id}.json")
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        return trace_path
+    
+    def print_summary(self):
+        """단계별 시간과 구간 종류별 합계 출력"""
+        print(f"\n단계별 프로파일")
+        print("-" * 30)
+        for event in self.events:
+            if event['cat'] == 'stage':
+                args = event['args']
+                line = f"{event['name']:<10} wall {args['wall_ms'] / 1000:8.2f}초  CPU {args['cpu_ms'] / 1000:8.2f}초"
+                if 'py_peak_mb' in args:
+                    line += f"  파이썬 메모리 최고 {args['py_peak_mb']:.1f}MB"
+                if 'max_rss_mb' in args:
+                    line += f"  최대 RSS {args['max_rss_mb']:.1f}MB"
+                print(line)
+        
+        # 요청/대기/디코딩 등 세부 구간 합계
+        totals = {}
+        for event in self.events:
+            if event['cat'] != 'stage':
+                total = totals.setdefault(event['name'], {'count': 0, 'wall_ms': 0, 'cpu_ms': 0})
+                total['count'] += 1
+                total['wall_ms'] += event['args']['wall_ms']
+                total['cpu_ms'] += event['args']['cpu_ms']
+        
+        if totals:
+            print(f"\n구간별 합계")
+            print("-" * 30)
+            for name, total in sorted(totals.items(), key=lambda item: item[1]['wall_ms'], reverse=True):
+                print(f"{name:<16} {total['count']:6}회  wall {total['wall_ms'] / 1000:8.2f}초  "
+                      f"CPU {total['cpu_ms'] / 1000:8.2f}초")
+    
+    def finish(self):
+        """트레이스 저장 및 요약 출력 (profiling이 켜진 경우만)"""
+        if not self.enabled:
+            return None
+        
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        
+        trace_path = self.save_trace()
+        self.print_summary()
+        print(f"트레이스 저장: {trace_path}")
+        return trace_path
+
 def collect_matches(self):
     """설정에 따른 매치 수집"""
     print("\n1단계: 매치 수집")
@@ -75,12 +805,12 @@ class MultiModePubgAnalyzer:
         self.api_key = api_key
         self.settings = settings
         self.base_url = 'https://api.pubg.com'
-        self.headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Accept': 'application/vnd.api+json'
-        }
+        self.profiler = RunProfiler(settings)
+        self.transport = PubgApiTransport(api_key, settings, before_request=self.count_request,
+                                          profiler=self.profiler)
         
         self.current_season_id = None
+        self.players = PlayerTable()
         self.request_count = 0
         self.start_time = time.time()
         
@@ -110,31 +840,37 @@ class MultiModePubgAnalyzer:
         
         time.sleep(1)
     
-    def make_api_request(self, url, description=""):
-        """안전한 API 요청"""
-        self.wait_for_rate_limit()
+    def count_request(self, description=""):
+        """전송 직전 Rate Limit 대기 및 요청 수 집계 (재시도 포함)"""
+        with self.profiler.span('rate_limit_wait', 'wait'):
+            self.wait_for_rate_limit()
         
         self.request_count += 1
         print(f"API 요청 ({self.request_count}/10): {description}")
-        
+    
+    def make_api_request(self, url, description=""):
+        """안전한 API 요청"""
+        endpoint = self.transport.get_endpoint(url)
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            
-            if response.status_code == 429:
-                print("Rate limit 초과. 60초 대기...")
-                time.sleep(60)
-                return self.make_api_request(url, description)
-            
-            if response.status_code in [400, 404]:
-                print(f"{response.status_code}: {description}")
-                return None
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except Exception as e:
+            response = self.transport.get(url, description)
+        except (PubgApiError, requests.RequestException) as e:
+            # 재시도 후 실패했거나 재시도 대상이 아닌 전송 오류는 이 요청만 건너뜀
             print(f"API 요청 실패 ({description}): {e}")
             return None
+        
+        if response.status_code in [400, 404]:
+            print(f"{response.status_code}: {description}")
+            return None
+        
+        # 401/403 등은 재시도해도 소용없으므로 분석 중단
+        response.raise_for_status()
+        
+        try:
+            with self.profiler.span('json_decode', 'cpu', endpoint=endpoint):
+                return response.json()
+        except ValueError as e:
+            print(f"응답 파싱 실패 ({description}): {e}")
+            return None
     
     def get_current_season(self):
         """현재 시즌 찾기"""
@@ -496,6 +1232,16 @@ class MultiModePubgAnalyzer:
         participants = match_info['participants']
         game_mode = match_info['game_mode']
         
+        # 매치 단위 정보는 한 번만 저장하고 참가자 레코드들이 공유
+        match = MatchRecord(
+            match_info['match_id'],
+            match_number,
+            game_mode,
+            match_info['is_ranked'],
+            datetime.now().isoformat(),
+            self.players
+        )
+        
         # 각 참가자의 레이팅 정보 추가
         complete_data = []
         rated_count = 0
@@ -516,16 +1262,17 @@ class MultiModePubgAnalyzer:
                 rated_count += 1
             
             # 완전한 데이터 구성 (모든 플레이어 포함)
-            complete_data.append({
-                'match_id': match_info['match_id'],
-                'match_number': match_number,
-                'game_mode': game_mode,
-                'is_ranked': match_info['is_ranked'],
-                **participant,  # kills, damage, assists, win_place, time_survived
-                'current_rp': current_rp,
-                'best_rp': best_rp,
-                'analyzed_at': datetime.now().isoformat()
-            })
+            complete_data.append(ParticipantRecord(
+                match,
+                self.players.add(participant['player_id'], participant['player_name']),
+                kills=participant['kills'],
+                damage=participant['damage'],
+                assists=participant['assists'],
+                win_place=participant['win_place'],
+                time_survived=participant['time_survived'],
+                current_rp=current_rp,
+                best_rp=best_rp
+            ))
         
         rating_coverage = (rated_count / len(participants)) * 100
         print(f"   매치 {match_number} 완료: {len(participants)}명, 레이팅 보유 {rated_count}명 ({rating_coverage:.1f}%)")
@@ -543,10 +1290,12 @@ class MultiModePubgAnalyzer:
             # 0단계: 시즌 확인
             print("0단계: 현재 시즌 확인")
             print("-" * 40)
-            self.current_season_id = self.get_current_season()
+            with self.profiler.span('season'):
+                self.current_season_id = self.get_current_season()
             
             # 1단계: 매치 수집
-            match_ids = self.collect_matches()
+            with self.profiler.span('collect'):
+                match_ids = self.collect_matches()
             if not match_ids:
                 return None
             
@@ -555,12 +1304,14 @@ class MultiModePubgAnalyzer:
             print("-" * 40)
             
             valid_matches = []
-            for i, match_id in enumerate(match_ids, 1):
-                print(f"매치 {i}/{len(match_ids)}: {match_id[:15]}... 확인 중")
-                
-                match_info = self.get_core_match_data(match_id)
-                if match_info:
-                    valid_matches.append(match_info)
+            with self.profiler.span('filter'):
+                for i, match_id in enumerate(match_ids, 1):
+                    print(f"매치 {i}/{len(match_ids)}: {match_id[:15]}... 확인 중")
+                    
+                    with self.profiler.span('filter_match', 'match', match_id=match_id):
+                        match_info = self.get_core_match_data(match_id)
+                    if match_info:
+                        valid_matches.append(match_info)
             
             if not valid_matches:
                 print("분석 가능한 매치가 없습니다.")
@@ -586,21 +1337,23 @@ class MultiModePubgAnalyzer:
             
             all_data = []
             
-            for i, match_info in enumerate(valid_matches, 1):
-                match_data = self.analyze_match_with_ratings(match_info, i, len(valid_matches))
-                all_data.extend(match_data)
-                
-                progress = (i / len(valid_matches)) * 100
-                print(f"전체 진행률: {progress:.1f}% ({i}/{len(valid_matches)} 매치 완료)")
+            with self.profiler.span('enrich'):
+                for i, match_info in enumerate(valid_matches, 1):
+                    with self.profiler.span('enrich_match', 'match', match_id=match_info['match_id'],
+                                            game_mode=match_info['game_mode']):
+                        match_data = self.analyze_match_with_ratings(match_info, i, len(valid_matches))
+                    all_data.extend(match_data)
+                    
+                    progress = (i / len(valid_matches)) * 100
+                    print(f"전체 진행률: {progress:.1f}% ({i}/{len(valid_matches)} 매치 완료)")
             
             # 4단계: 결과 정리
             print(f"\n4단계: 결과 정리")
             print("-" * 40)
             
             if all_data:
-                results = self.process_results(all_data)
-                self.save_results(results)
-                self.print_summary(results)
+                with self.profiler.span('report'):
+                    results = self.report_results(all_data)
                 
                 elapsed_time = time.time() - start_time
                 print(f"\n다중 모드 분석 완료! (소요 시간: {elapsed_time/60:.1f}분)")
@@ -616,6 +1369,85 @@ class MultiModePubgAnalyzer:
         except Exception as e:
             print(f"\n예상치 못한 오류: {e}")
             return None
+        finally:
+            self.transport.close()
+            self.profiler.finish()
+    
+    def report_results(self, all_data, prefix=RESULT_PREFIX):
+        """통계 계산, 저장, 요약 출력"""
+        with self.profiler.span('process_results', 'cpu'):
+            results = self.process_results(all_data)
+        with self.profiler.span('save_results', 'io'):
+            self.save_results(results, prefix)
+        self.print_summary(results)
+        return results
+    
+    def analyze_saved_results(self, paths):
+        """저장된 분석 결과들을 병합하여 오프라인 재분석 (네트워크 사용 안 함)"""
+        print("저장된 결과 오프라인 재분석 시작!")
+        print("=" * 60)
+        
+        if not paths:
+            print("불러올 결과 파일이 없습니다.")
+            return None
+        
+        # (match_id, player_id) 기준 중복 제거 - 더 최근에 분석된 행 우선
+        # 레코드의 analyzed_at은 매치 단위로 공유되므로 행별 시각은 따로 보관
+        merged = {}
+        analyzed_times = {}
+        seasons = []
+        match_cache = {}
+        
+        with self.profiler.span('load'):
+            for path in paths:
+                metadata = {}
+                loaded = 0
+                
+                try:
+                    with self.profiler.span('load_file', 'io', path=path):
+                        for row in iter_saved_rows(path, metadata):
+                            key = (row.get('match_id'), row.get('player_id'))
+                            analyzed_at = str(row.get('analyzed_at') or '')
+                            if key not in merged or analyzed_at > analyzed_times[key]:
+                                merged[key] = make_participant_record(row, self.players, match_cache)
+                                analyzed_times[key] = analyzed_at
+                            loaded += 1
+                except (OSError, ValueError) as e:
+                    print(f"   {path} 로딩 실패: {e}")
+                    continue
+                
+                season = metadata.get('statistics', {}).get('current_season')
+                if season and season not in seasons:
+                    seasons.append(season)
+                
+                print(f"   {path}: {loaded}행")
+        
+        if not merged:
+            print("수집된 데이터가 없습니다.")
+            return None
+        
+        all_data = list(merged.values())
+        print(f"\n병합 결과: {len(all_data)}행 (중복 제거 후)")
+        
+        # 실행마다 1부터 시작하는 매치 번호를 병합 기준으로 다시 부여
+        match_numbers = {}
+        for data in all_data:
+            match_numbers.setdefault(data['match_id'], len(match_numbers) + 1)
+            data['match_number'] = match_numbers[data['match_id']]
+        
+        # 저장된 데이터에 포함된 모드 기준으로 통계 계산
+        found_modes = {data['game_mode'] for data in all_data}
+        modes = [mode for mode in MODE_ORDER if mode in found_modes]
+        modes += sorted(found_modes - set(MODE_ORDER))
+        self.settings = {**self.settings, 'game_modes': modes}
+        self.current_season_id = ', '.join(seasons) if seasons else None
+        
+        with self.profiler.span('report'):
+            # 병합 결과는 다음 analyze 실행의 입력과 섞이지 않도록 다른 이름으로 저장
+            results = self.report_results(all_data, prefix=MERGED_RESULT_PREFIX)
+        self.profiler.finish()
+        
+        return results
     
     def process_results(self, all_data):
         """결과 데이터 처리"""
@@ -652,10 +1484,14 @@ class MultiModePubgAnalyzer:
         # 레이팅 정보가 있는 플레이어들만
         rated_data = [d for d in all_data if d['current_rp'] > 0]
         
+        with self.profiler.span('bootstrap', 'cpu'):
+            confidence_intervals = self.compute_confidence_intervals(matches)
+        
         return {
             'matches': matches,
             'all_players': all_data,
             'mode_statistics': mode_stats,
+            'mode_confidence_intervals': confidence_intervals,
             'statistics': {
                 'total_matches': len(matches),
                 'total_players': total_players,
@@ -671,20 +1507,72 @@ class MultiModePubgAnalyzer:
             }
         }
     
-    def save_results(self, results):
+    def compute_confidence_intervals(self, matches):
+        """게임 모드별 지표의 부트스트랩 신뢰구간 (플레이어가 아닌 매치 단위 재표본)"""
+        n_resamples = self.settings.get('bootstrap_resamples', 0)
+        confidence = self.settings.get('bootstrap_confidence', 0.95)
+        
+        if not n_resamples:
+            return {}
+        if np is None:
+            print("numpy가 없어 신뢰구간 계산을 건너뜁니다.")
+            return {}
+        
+        print(f"모드별 부트스트랩 신뢰구간 계산 중 ({n_resamples}회 재표본)...")
+        
+        metrics = list(BOOTSTRAP_METRICS)
+        mode_intervals = {}
+        
+        for mode in self.settings['game_modes']:
+            mode_matches = [rows for rows in matches.values() if rows and rows[0]['game_mode'] == mode]
+            if len(mode_matches) < 2:
+                continue
+            
+            terms = [get_match_metric_terms(rows) for rows in mode_matches]
+            numerators = np.array([[term[metric][0] for term in terms] for metric in metrics])
+            denominators = np.array([[term[metric][1] for term in terms] for metric in metrics])
+            
+            # 값이 있는 매치가 2개 이상인 지표만 계산
+            match_counts = np.count_nonzero(denominators, axis=1)
+            active = np.flatnonzero(match_counts >= 2)
+            if len(active) == 0:
+                continue
+            
+            estimates, lower, upper = bootstrap_confidence_intervals(
+                numerators[active], denominators[active], n_resamples, confidence,
+                workers=self.settings.get('bootstrap_workers'),
+                seed=self.settings.get('bootstrap_seed')
+            )
+            
+            mode_intervals[mode] = {}
+            for i, metric_index in enumerate(active):
+                metric = metrics[metric_index]
+                n_matches = int(match_counts[metric_index])
+                mode_intervals[mode][metric] = {
+                    'estimate': float(estimates[i]),
+                    'ci_low': float(lower[i]),
+                    'ci_high': float(upper[i]),
+                    'confidence': confidence,
+                    'n_matches': n_matches,
+                    'n_resamples': n_resamples
+                }
+        
+        return mode_intervals
+    
+    def save_results(self, results, prefix=RESULT_PREFIX):
         """결과 저장"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # JSON 저장
-        json_filename = f"pubg_multimode_analysis_{timestamp}.json"
+        json_filename = f"{prefix}_{timestamp}.json"
         with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False, default=str)
+            json.dump(results, f, indent=2, ensure_ascii=False, default=_json_default)
         print(f"JSON 저장: {json_filename}")
         
         # CSV 저장
-        csv_filename = f"pubg_multimode_analysis_{timestamp}.csv"
+        csv_filename = f"{prefix}_{timestamp}.csv"
         if results['all_players']:
-            fieldnames = results['all_players'][0].keys()
+            fieldnames = list(results['all_players'][0].keys())
             with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as f:
                 writer = csv.DictWriter(f, fieldnames=fieldnames)
                 writer.writeheader()
@@ -726,6 +1614,12 @@ class MultiModePubgAnalyzer:
                     print(f"  평균 최고 RP: {mode_stat['avg_best_rp']:.0f}")
                 print(f"  평균 킬: {mode_stat['avg_kills']:.1f}")
                 print(f"  평균 데미지: {mode_stat['avg_damage']:.0f}")
+                
+                intervals = results.get('mode_confidence_intervals', {}).get(mode, {})
+                for metric, interval in intervals.items():
+                    print(f"  {BOOTSTRAP_METRICS[metric]}: {interval['estimate']:.2f} "
+                          f"({interval['confidence'] * 100:.0f}% CI {interval['ci_low']:.2f} ~ {interval['ci_high']:.2f}, "
+                          f"매치 {interval['n_matches']}개)")
         
         # RP 분포 (간단화)
         print(f"\nRP 분포")
@@ -794,5 +1688,27 @@ def main():
         print(f"   3. ranked_only를 False로 변경 (일반 매치도 포함)")
         print(f"   4. game_modes에서 일부 모드 제외")
 
+def analyze_main(patterns):
+    """저장된 결과 파일 오프라인 재분석 진입점"""
+    print("PUBG 다중 모드 분석기 - 오프라인 재분석")
+    print("=" * 60)
+    
+    paths = expand_result_paths(patterns or ['.'])
+    print(f"결과 파일 {len(paths)}개")
+    for path in paths:
+        print(f"   - {path}")
+    print()
+    
+    analyzer = MultiModePubgAnalyzer(API_KEY, SETTINGS)
+    results = analyzer.analyze_saved_results(paths)
+    
+    if not results:
+        print(f"\n오프라인 재분석에 실패했습니다.")
+        print(f"사용법: python rating_analyzer.py analyze [결과 파일/디렉터리/패턴 ...]")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python rating_analyzer.py analyze pubg_multimode_analysis_*.json
+    if len(sys.argv) > 1 and sys.argv[1] == 'analyze':
+        analyze_main(sys.argv[2:])
+    else:
+        main()
\ No newline at end of file